@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
 
 import typer
@@ -13,8 +14,12 @@ from storage import (
     replace_tasks_section,
     replace_summary_section,
     serialize_tasks_to_section,
+    splice_section,
+    strip_summary_section,
     write_daily_md,
     parse_tasks_from_markdown,
+    parse_tasks_and_span,
+    get_task_section_only,
     Task,
     TASK_SECTION_HEADER,
     SUMMARY_SECTION_HEADER,
@@ -22,12 +27,6 @@ from storage import (
     CHECK_DONE,
     CHECK_PENDING,
 )
-from llm import (
-    generate_today_tasks,
-    parse_update_intent,
-    summarize_daily,
-    summarize_weekly,
-)
 
 
 def _parse_date(s: str) -> date:
@@ -41,6 +40,8 @@ def cmd_generate(
                                         help="日期 YYYY-MM-DD，默认今天"),
 ) -> None:
   """根据昨天未完成事项生成今天的任务列表；首次无历史任务时不自动添加任务。"""
+  from llm import generate_today_tasks
+
   base = get_base_dir()
   today = date.fromisoformat(date_str) if date_str else date.today()
   yesterday = today - timedelta(days=1)
@@ -102,46 +103,49 @@ def cmd_update(
                                         help="日期 YYYY-MM-DD，默认今天"),
 ) -> None:
   """根据自然语言更新当日任务（完成/新增/废弃/改描述）。"""
+  from llm import parse_update_intent
+
   base = get_base_dir()
   d = date.fromisoformat(date_str) if date_str else date.today()
   content = read_daily_md(base, d)
-  tasks = parse_tasks_from_markdown(content)
   # 无任务时仍可「新增」；无文件时用当日标题创建
   if not content.strip():
     content = f"# {d.isoformat()}\n\n{TASK_SECTION_HEADER}\n\n"
-  from storage import get_task_section_only
-  section_only = get_task_section_only(content)
+  # 一次扫描同时拿到任务与任务区位置，LLM 输入与回写都直接按位置切片
+  tasks, span = parse_tasks_and_span(content)
+  if span is not None:
+    section_only = content[span[0]:span[1]]
+  else:
+    section_only = get_task_section_only(content)
   edits = parse_update_intent(section_only, message)
-  # Apply completed_indices
-  completed = set(edits.get("completed_indices") or [])
-  for t in tasks:
-    if t.index in completed:
-      t.status = CHECK_DONE
-  # Apply abandoned_indices
-  abandoned = set(edits.get("abandoned_indices") or [])
-  for t in tasks:
-    if t.index in abandoned:
-      t.status = CHECK_ABANDONED
-  # Apply text_edits
+  completed = frozenset(edits.get("completed_indices") or [])
+  abandoned = frozenset(edits.get("abandoned_indices") or [])
   text_edits = {
       e["index"]: e["new_title"]
       for e in edits.get("text_edits") or []
       if "index" in e and "new_title" in e
   }
+  # Apply completed / abandoned / text_edits in a single pass (abandoned wins)
   for t in tasks:
+    if t.index in abandoned:
+      t.status = CHECK_ABANDONED
+    elif t.index in completed:
+      t.status = CHECK_DONE
     if t.index in text_edits:
       t.title = text_edits[t.index]
-  # Apply new_tasks (append as pending)
-  new_titles = edits.get("new_tasks") or []
+  # Apply new_tasks (append as pending; drop blanks and repeats, keep order)
+  new_titles = list(
+      dict.fromkeys(s for s in (str(t).strip()
+                                 for t in edits.get("new_tasks") or []) if s))
   max_idx = max(t.index for t in tasks) if tasks else 0
   for i, title in enumerate(new_titles):
-    tasks.append(
-        Task(index=max_idx + 1 + i,
-             title=title,
-             status=CHECK_PENDING,
-             raw_line=""))
+    tasks.append(Task(index=max_idx + 1 + i, title=title,
+                      status=CHECK_PENDING))
   new_section = serialize_tasks_to_section(tasks)
-  new_content = replace_tasks_section(content, new_section)
+  if span is not None:
+    new_content = splice_section(content, span[0], span[1], new_section)
+  else:
+    new_content = replace_tasks_section(content, new_section)
   write_daily_md(base, d, new_content)
   typer.echo("已按你的描述更新任务列表。")
 
@@ -152,25 +156,67 @@ def cmd_summary(
         None, "--date", "-d", help="日期 YYYY-MM-DD，默认今天；weekly 时表示结束日"),
 ) -> None:
   """日总结：写入当日 md 的「日总结」区并输出；周总结：对过去 7 天做汇总。"""
+  from llm import (
+      async_client,
+      asummarize_daily,
+      summarize_daily,
+      summarize_daily_batch,
+  )
+
   base = get_base_dir()
   end_date = date.fromisoformat(date_str) if date_str else date.today()
   if kind == "daily":
     content = read_daily_md(base, end_date)
-    summary = summarize_daily(content, end_date.isoformat())
+    # 旧的「日总结」正是要重写的部分，不再送给 LLM；边生成边输出，用户只需等待首个 token
+    summary = summarize_daily(strip_summary_section(content),
+                              end_date.isoformat(),
+                              on_chunk=lambda s: typer.echo(s, nl=False))
+    typer.echo("")
     if content.strip():
       new_content = replace_summary_section(content, summary)
     else:
       new_content = f"# {end_date.isoformat()}\n\n{TASK_SECTION_HEADER}\n\n\n{SUMMARY_SECTION_HEADER}\n\n{summary}"
     write_daily_md(base, end_date, new_content)
     typer.echo("已写入当日文档的「日总结」区。")
-    typer.echo(summary)
   elif kind == "weekly":
-    mds: list[tuple[str, str]] = []
-    for i in range(6, -1, -1):
-      d = end_date - timedelta(days=i)
-      c = read_daily_md(base, d)
-      mds.append((d.isoformat(), c))
-    summary = summarize_weekly(mds)
+    dates = [end_date - timedelta(days=i) for i in range(6, -1, -1)]
+    # 7 天的文件互不依赖，并发读取以重叠 I/O 延迟（网络文件系统上尤为明显）
+    with ThreadPoolExecutor(max_workers=len(dates)) as ex:
+      contents = list(ex.map(lambda d: read_daily_md(base, d), dates))
+    mds: list[tuple[str, str]] = [
+        (d.isoformat(), strip_summary_section(c))
+        for d, c in zip(dates, contents)
+    ]
+    # 单次请求同时拿到 7 天的日总结与周总结，并并发回写有任务的日文件
+    daily, summary = summarize_daily_batch(mds)
+    # 只为真正有任务的日子写日总结；cmd_generate 创建的空骨架文件不算
+    has_tasks = [bool(parse_tasks_from_markdown(c)) for c in contents]
+    if daily is None:
+      daily = [""] * len(mds)
+    # 批量结果缺失的日总结（如 JSON 解析失败）并发逐日补齐
+    missing = [k for k, s in enumerate(daily) if has_tasks[k] and not s]
+    if missing:
+      # 仅在兜底补齐时才需要 asyncio，避免拖慢 list 等命令的启动
+      import asyncio
+
+      async def _fanout() -> list[str]:
+        sem = asyncio.Semaphore(8)
+        async with async_client() as client:
+
+          async def one(k: int) -> str:
+            async with sem:
+              return await asummarize_daily(client, mds[k][1], mds[k][0])
+
+          return await asyncio.gather(*(one(k) for k in missing))
+
+      for k, s in zip(missing, asyncio.run(_fanout())):
+        daily[k] = s
+    writes = [(d, replace_summary_section(c, day_summary))
+              for d, c, day_summary, ok in zip(dates, contents, daily, has_tasks)
+              if ok and day_summary]
+    if writes:
+      with ThreadPoolExecutor(max_workers=len(writes)) as ex:
+        list(ex.map(lambda w: write_daily_md(base, *w), writes))
     typer.echo(summary)
   else:
     typer.echo("请使用 daily 或 weekly。", err=True)
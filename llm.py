@@ -2,43 +2,197 @@
 
 from __future__ import annotations
 
+import functools
+import hashlib
 import json
 import os
-from typing import Any
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
 
-from openai import OpenAI
+import orjson
 
+from storage import TASK_SECTION_HEADER, atomic_write, get_base_dir
 
-def _client() -> OpenAI:
+if TYPE_CHECKING:
+  from openai import AsyncOpenAI, OpenAI
+
+
+def _client_kwargs() -> dict[str, Any]:
   api_key = os.environ.get("OPENAI_API_KEY", "").strip()
   base_url = os.environ.get("OPENAI_BASE_URL", "").strip() or None
   if not api_key:
     raise RuntimeError("OPENAI_API_KEY is not set")
-  return OpenAI(api_key=api_key, base_url=base_url)
+  return {"api_key": api_key, "base_url": base_url}
+
+
+@functools.lru_cache(maxsize=1)
+def _client() -> OpenAI:
+  """Build the client on first use and reuse it (and its connection pool) afterwards."""
+  # openai pulls in httpx/pydantic; import lazily so non-LLM commands start fast
+  from openai import OpenAI
+
+  return OpenAI(**_client_kwargs())
+
+
+def async_client() -> AsyncOpenAI:
+  """
+    New AsyncOpenAI client. Its connection pool belongs to the running event loop,
+    so create one per asyncio.run and close it there (use it as `async with`).
+    """
+  from openai import AsyncOpenAI
+
+  return AsyncOpenAI(**_client_kwargs())
 
 
 def _model() -> str:
   return os.environ.get("OPENAI_MODEL", "gpt-4o-mini").strip() or "gpt-4o-mini"
 
 
-def call_system_user(system: str, user: str) -> str:
-  """Single chat completion; returns assistant message content."""
-  client = _client()
-  resp = client.chat.completions.create(
-      model=_model(),
-      messages=[
-          {
-              "role": "system",
-              "content": system
-          },
-          {
-              "role": "user",
-              "content": user
-          },
-      ],
-  )
-  msg = resp.choices[0].message
-  return (msg.content or "").strip()
+# Entries kept in .llm_cache; least recently used ones are evicted beyond this
+_CACHE_MAX_ENTRIES = 256
+
+
+def _cache_enabled() -> bool:
+  return os.environ.get("DAILY_TODO_LLM_CACHE", "").strip() != "0"
+
+
+def _cache_path(key: str) -> Path:
+  return get_base_dir() / ".llm_cache" / f"{key}.txt"
+
+
+def _cache_get(key: str) -> str | None:
+  p = _cache_path(key)
+  try:
+    val = p.read_bytes().decode("utf-8")
+  except FileNotFoundError:
+    return None
+  os.utime(p)  # mtime doubles as last-used time for eviction
+  return val
+
+
+def _cache_put(key: str, val: str) -> None:
+  p = _cache_path(key)
+  atomic_write(p, val.encode("utf-8"))
+  entries = list(p.parent.glob("*.txt"))
+  if len(entries) <= _CACHE_MAX_ENTRIES:
+    return
+  entries.sort(key=lambda e: e.stat().st_mtime)
+  for e in entries[:len(entries) - _CACHE_MAX_ENTRIES]:
+    e.unlink(missing_ok=True)
+
+
+def _cache_key(model: str, system: str, user: str, json_mode: bool = False) -> str:
+  return hashlib.sha256(
+      f"{model}\x00{int(json_mode)}\x00{system}\x00{user}".encode(
+          "utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _sys_msg(system: str) -> dict[str, str]:
+  # System prompts are a handful of module-level constants; build each dict once
+  return {"role": "system", "content": system}
+
+
+def _messages(system: str, user: str) -> list[dict[str, str]]:
+  return [_sys_msg(system), {"role": "user", "content": user}]
+
+
+def _prepare(system: str, user: str,
+             json_mode: bool) -> tuple[str | None, str | None, dict[str, Any]]:
+  """
+    Shared front half of every completion call: returns (cache key or None when
+    caching is off, cached reply or None, kwargs for chat.completions.create).
+    """
+  model = _model()
+  key = cached = None
+  if _cache_enabled():
+    key = _cache_key(model, system, user, json_mode)
+    cached = _cache_get(key)
+  kwargs: dict[str, Any] = {
+      "model": model,
+      "temperature": 0,
+      "messages": _messages(system, user),
+  }
+  if json_mode:
+    kwargs["response_format"] = {"type": "json_object"}
+  return key, cached, kwargs
+
+
+def _finish(key: str | None,
+            content: str,
+            validate: Callable[[str], bool] | None = None) -> str:
+  """
+    Shared back half: store the reply under key (if caching) and return it.
+    Empty replies, and replies rejected by validate, are never cached so a
+    retry with the same input reaches the API again.
+    """
+  if key is not None and content and (validate is None or validate(content)):
+    _cache_put(key, content)
+  return content
+
+
+def _is_json_object(raw: str) -> bool:
+  try:
+    return isinstance(orjson.loads(raw.encode()), dict)
+  except json.JSONDecodeError:
+    return False
+
+
+def call_system_user(system: str,
+                     user: str,
+                     json_mode: bool = False,
+                     validate: Callable[[str], bool] | None = None) -> str:
+  """
+    Single chat completion; returns assistant message content.
+    json_mode asks the API for a bare JSON object (response_format=json_object).
+    Non-empty responses that pass validate are cached on disk by
+    sha256(model, system, user), keeping the 256 most recently used; set
+    DAILY_TODO_LLM_CACHE=0 to bypass the cache.
+    """
+  key, cached, kwargs = _prepare(system, user, json_mode)
+  if cached is not None:
+    return cached
+  resp = _client().chat.completions.create(**kwargs)
+  return _finish(key, (resp.choices[0].message.content or "").strip(),
+                 validate)
+
+
+async def acall_system_user(
+    client: AsyncOpenAI,
+    system: str,
+    user: str,
+    json_mode: bool = False,
+    validate: Callable[[str], bool] | None = None) -> str:
+  """Async variant of call_system_user for fanning out concurrent requests; same cache."""
+  key, cached, kwargs = _prepare(system, user, json_mode)
+  if cached is not None:
+    return cached
+  resp = await client.chat.completions.create(**kwargs)
+  return _finish(key, (resp.choices[0].message.content or "").strip(),
+                 validate)
+
+
+def call_system_user_streaming(system: str, user: str,
+                               on_chunk: Callable[[str], None]) -> str:
+  """
+    Streaming variant of call_system_user: on_chunk receives each content delta
+    as it arrives; returns the full (stripped) text. Shares the on-disk cache,
+    and a cache hit is delivered to on_chunk in one piece.
+    """
+  key, cached, kwargs = _prepare(system, user, False)
+  if cached is not None:
+    on_chunk(cached)
+    return cached
+  resp = _client().chat.completions.create(**kwargs, stream=True)
+  parts: list[str] = []
+  for chunk in resp:
+    if not chunk.choices:
+      continue
+    delta = chunk.choices[0].delta.content
+    if delta:
+      on_chunk(delta)
+      parts.append(delta)
+  return _finish(key, "".join(parts).strip())
 
 
 def generate_today_tasks(yesterday_pending_titles: list[str], today_iso: str) -> str:
@@ -59,6 +213,19 @@ def generate_today_tasks(yesterday_pending_titles: list[str], today_iso: str) ->
 # --- Update intent (structured JSON) ---
 
 
+def _canonical_md(md: str) -> str:
+  """
+    Normalize whitespace (trailing blanks per line, runs of blank lines) so the
+    same task list always yields the same prompt bytes and prefix caches hit.
+    """
+  lines: list[str] = []
+  for line in md.splitlines():
+    line = line.rstrip()
+    if line or (lines and lines[-1]):
+      lines.append(line)
+  return "\n".join(lines).rstrip() + "\n"
+
+
 def parse_update_intent(today_md: str, user_message: str) -> dict[str, Any]:
   """
     Parse user's natural language into structured edits.
@@ -73,18 +240,11 @@ def parse_update_intent(today_md: str, user_message: str) -> dict[str, Any]:
 - new_tasks: 用户要求「新增」的任务描述列表，如 ["写周报", "开会"]
 - text_edits: 用户要求「修改」某任务描述时的列表，每项 { "index": 1, "new_title": "新描述" }
 若某项没有则填空列表 [] 或省略该字段。"""
-  user = f"当前任务列表（Markdown）：\n\n{today_md}\n\n用户说：{user_message}"
-  raw = call_system_user(system, user)
-  # Strip possible markdown code fence
-  if raw.startswith("```"):
-    lines = raw.split("\n")
-    if lines[0].startswith("```"):
-      lines = lines[1:]
-    if lines and lines[-1].strip() == "```":
-      lines = lines[:-1]
-    raw = "\n".join(lines)
+  user = f"当前任务列表（Markdown）：\n\n{_canonical_md(today_md)}\n\n用户说：{user_message}"
+  raw = call_system_user(system, user, json_mode=True, validate=_is_json_object)
   try:
-    return json.loads(raw)
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError
+    return orjson.loads(raw.encode())
   except json.JSONDecodeError:
     return {
         "completed_indices": [],
@@ -94,16 +254,88 @@ def parse_update_intent(today_md: str, user_message: str) -> dict[str, Any]:
     }
 
 
-def summarize_daily(md: str, date_iso: str) -> str:
-  """生成真实、简要的日总结，适合写入当日文档。"""
+def _day_body(md: str) -> str:
+  """当日 Markdown；空白时给出明确的结构化占位，而不是含糊的「无内容」。"""
+  return md if md.strip() else f"{TASK_SECTION_HEADER}\n\n（当日无任务记录）"
+
+
+def _daily_prompt(md: str, date_iso: str) -> tuple[str, str]:
   system = "你是日程总结助手。根据当日日程 Markdown 写一句真实、简要的日总结（一两句话），只写事实与进展，不要空话。只输出总结正文，不要标题。"
-  user = f"日期：{date_iso}\n\n内容：\n\n{md or '（无内容）'}"
+  return system, f"日期：{date_iso}\n\n内容：\n\n{_day_body(md)}"
+
+
+def summarize_daily(md: str,
+                    date_iso: str,
+                    on_chunk: Callable[[str], None] | None = None) -> str:
+  """生成真实、简要的日总结，适合写入当日文档；传入 on_chunk 时流式输出。"""
+  system, user = _daily_prompt(md, date_iso)
+  if on_chunk is not None:
+    return call_system_user_streaming(system, user, on_chunk)
   return call_system_user(system, user)
 
 
+async def asummarize_daily(client: AsyncOpenAI, md: str, date_iso: str) -> str:
+  """Async summarize_daily, for concurrent per-day fan-out on a shared client."""
+  system, user = _daily_prompt(md, date_iso)
+  return await acall_system_user(client, system, user)
+
+
 def summarize_weekly(mds: list[tuple[str, str]]) -> str:
   """Summarize multiple (date_iso, content) into one weekly summary in Chinese."""
-  parts = "\n\n---\n\n".join(f"## {d}\n\n{c}" for d, c in mds)
+  # 先收集片段再一次 join，避免 parts 与 user 两份大字符串同时驻留
+  chunks = ["一周日程：\n\n"]
+  for d, c in mds:
+    chunks.extend(("## ", d, "\n\n", c, "\n\n---\n\n"))
+  if mds:
+    chunks.pop()
   system = "你是一个周报总结助手。下面是一周内几天的日程内容，请用简短中文做一周汇总总结，突出完成情况与重点。只输出总结正文。"
-  user = "一周日程：\n\n" + parts
+  user = "".join(chunks)
   return call_system_user(system, user)
+
+
+def _parse_batch_reply(raw: str) -> tuple[list[str], str] | None:
+  """
+    Parse {"daily": [str, ...], "weekly": str}; None unless daily is a list of
+    strings and weekly is a non-empty string.
+    """
+  try:
+    data = orjson.loads(raw.encode())
+  except json.JSONDecodeError:
+    return None
+  if not isinstance(data, dict):
+    return None
+  daily, weekly = data.get("daily"), data.get("weekly")
+  if not isinstance(daily, list) or not all(isinstance(s, str) for s in daily):
+    return None
+  if not isinstance(weekly, str) or not weekly.strip():
+    return None
+  return [s.strip() for s in daily], weekly.strip()
+
+
+def summarize_daily_batch(
+    mds: list[tuple[str, str]]) -> tuple[list[str] | None, str]:
+  """
+    一次请求同时生成多天的日总结与整体周总结，避免逐日多次往返。
+    mds 为 (date_iso, content) 列表；返回 (与 mds 等长的日总结列表, 周总结)。
+    回复无法解析时返回 (None, summarize_weekly(mds))，不会把原始输出当作周总结。
+    """
+  system = """你是日程总结助手。用户会给出连续若干天的日程 Markdown，每天以「### DAY k (日期)」开头，k 从 0 开始。
+请输出一个 JSON 对象，且只输出该 JSON，不要用 markdown 代码块包裹。
+字段说明：
+- daily: 字符串数组，长度与天数相同，第 k 项为 DAY k 的日总结（一两句话，只写事实与进展，不要空话；当天无内容则填空字符串）
+- weekly: 字符串，对这几天做简短中文汇总总结，突出完成情况与重点"""
+  # 与 summarize_weekly 相同：片段直接入列表再一次 join，不为每天先拼出一份中间字符串
+  chunks: list[str] = []
+  for k, (d, c) in enumerate(mds):
+    chunks.extend(("### DAY ", str(k), " (", d, ")\n", _day_body(c), "\n"))
+  user = "".join(chunks)
+  raw = call_system_user(system,
+                         user,
+                         json_mode=True,
+                         validate=lambda r: _parse_batch_reply(r) is not None)
+  parsed = _parse_batch_reply(raw)
+  if parsed is None:
+    return None, summarize_weekly(mds)
+  daily, weekly = parsed
+  daily = (daily + [""] * len(mds))[:len(mds)]
+  return daily, weekly
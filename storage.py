@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import os
 import re
+import tempfile
 from dataclasses import dataclass
 from datetime import date
 from pathlib import Path
@@ -37,14 +38,14 @@ def ensure_dir(p: Path) -> None:
     p.parent.mkdir(parents=True, exist_ok=True)
 
 
-@dataclass
+@dataclass(slots=True)
 class Task:
     """Single task with 1-based index for display/edits."""
 
     index: int
     title: str
     status: str  # " ", "x", "~"
-    raw_line: str  # original line for minimal-diff writes
+    raw_line: str | None = None  # original line for minimal-diff writes; None for new tasks
 
     @property
     def is_pending(self) -> bool:
@@ -62,21 +63,30 @@ class Task:
         return f"- [{self.status}] {self.title}"
 
 
-# Match: - [ ] xxx, - [x] xxx, - [~] xxx (optional leading whitespace)
-_TASK_LINE = re.compile(r"^\s*-\s*\[([ x~])\]\s*(.*)$", re.IGNORECASE)
+_HEADERS = frozenset((TASK_SECTION_HEADER, ABANDONED_SECTION_HEADER))
+_H2 = "## "
+
+# Fallback for irregular spacing: -[x] xxx, -  [ ] xxx (input is already lstripped)
+_TASK_LINE = re.compile(r"-\s*\[([ x~])\]\s*(.*)$", re.IGNORECASE)
+
+_STATUS_CHARS = {" ": CHECK_PENDING, "x": CHECK_DONE, "X": CHECK_DONE, "~": CHECK_ABANDONED}
 
 
 def _parse_task_line(line: str, index: int) -> Task | None:
-    m = _TASK_LINE.match(line.strip())
+    s = line.lstrip()
+    if not s.startswith("-"):
+        return None
+    # Fast path for the canonical "- [c] title" layout: fixed-offset checks, no regex
+    if len(s) >= 5 and s[1] == " " and s[2] == "[" and s[4] == "]":
+        status = _STATUS_CHARS.get(s[3])
+        if status is not None:
+            return Task(index=index, title=s[5:].strip(), status=status, raw_line=line.rstrip())
+    if "[" not in s:
+        return None
+    m = _TASK_LINE.match(s)
     if not m:
         return None
-    status = m.group(1).lower()
-    if status == "x":
-        status = CHECK_DONE
-    elif status == "~":
-        status = CHECK_ABANDONED
-    else:
-        status = CHECK_PENDING
+    status = _STATUS_CHARS[m.group(1)]
     title = m.group(2).strip()
     return Task(index=index, title=title, status=status, raw_line=line.rstrip())
 
@@ -93,25 +103,23 @@ def parse_tasks_from_markdown(content: str) -> list[Task]:
 
     for line in content.splitlines():
         stripped = line.strip()
-        if stripped == TASK_SECTION_HEADER:
-            in_tasks = True
-            in_abandoned = False
+        if not stripped:
             continue
-        if stripped == ABANDONED_SECTION_HEADER:
-            in_abandoned = True
-            in_tasks = False
+        if stripped in _HEADERS:
+            in_tasks = stripped == TASK_SECTION_HEADER
+            in_abandoned = not in_tasks
             continue
-        if stripped.startswith("## "):
+        if stripped.startswith(_H2):
             in_tasks = False
             in_abandoned = False
             continue
 
-        if in_tasks or in_abandoned:
+        if (in_tasks or in_abandoned) and stripped.startswith("-"):
             t = _parse_task_line(line, index + 1)
             if t:
                 index += 1
                 if in_abandoned:
-                    t = Task(index=t.index, title=t.title, status=CHECK_ABANDONED, raw_line=t.raw_line)
+                    t.status = CHECK_ABANDONED
                 tasks.append(t)
 
     return tasks
@@ -135,18 +143,114 @@ def serialize_tasks_to_section(tasks: list[Task]) -> str:
 
 
 def read_daily_md(base_dir: Path, d: date) -> str:
-    """Read full content of YYYY-MM-DD.md; return empty string if missing."""
+    """Read full content of YYYY-MM-DD.md with \r\n normalized to \n; return empty string if missing."""
     p = path_for_date(base_dir, d)
-    if not p.is_file():
+    try:
+        # Section rewriters emit \n; normalize here so CRLF files never end up mixed
+        return p.read_bytes().decode("utf-8").replace("\r\n", "\n")
+    except FileNotFoundError:
         return ""
-    return p.read_text(encoding="utf-8")
 
 
-def write_daily_md(base_dir: Path, d: date, content: str) -> None:
-    """Write full content to YYYY-MM-DD.md, creating dirs if needed."""
-    p = path_for_date(base_dir, d)
+def _default_file_mode() -> int:
+    # os.umask can only be read by setting it; do that once at import, before any threads
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+_DEFAULT_FILE_MODE = _default_file_mode()
+
+
+def atomic_write(p: Path, data: bytes) -> None:
+    """
+    Write data to p via a temp file in the same directory renamed over the target.
+    The temp file is fsynced before the rename, so after a crash or power loss p
+    holds either the old or the new content, never a truncated mix.
+    Symlinks are followed: the real target is what gets replaced.
+    Creates parent dirs if needed.
+    """
+    p = p.resolve()
     ensure_dir(p)
-    p.write_text(content, encoding="utf-8")
+    try:
+        mode = p.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = _DEFAULT_FILE_MODE
+    f = tempfile.NamedTemporaryFile(dir=p.parent, prefix=f".{p.name}.", suffix=".tmp", delete=False)
+    try:
+        with f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(f.name, mode)  # NamedTemporaryFile creates 0600
+        os.replace(f.name, p)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+
+def write_daily_md(base_dir: Path, d: date, content: str) -> None:
+    """Write full content to YYYY-MM-DD.md atomically, creating dirs if needed."""
+    atomic_write(path_for_date(base_dir, d), content.encode("utf-8"))
+
+
+def _header_line_start(content: str, header: str, pos: int = 0) -> int:
+    """Offset of the first line at/after pos whose stripped text equals header, or -1."""
+    while True:
+        i = content.find(header, pos)
+        if i < 0:
+            return -1
+        line_start = content.rfind("\n", 0, i) + 1
+        line_end = content.find("\n", i)
+        if line_end < 0:
+            line_end = len(content)
+        if not content[line_start:i].strip() and not content[i + len(header):line_end].strip():
+            return line_start
+        pos = i + len(header)
+
+
+def _next_h2_start(content: str, pos: int) -> int:
+    """Offset of the first line at/after pos starting with "## " (after indent), or len(content)."""
+    while True:
+        i = content.find("## ", pos)
+        if i < 0:
+            return len(content)
+        line_start = content.rfind("\n", 0, i) + 1
+        if line_start >= pos and not content[line_start:i].strip():
+            return line_start
+        pos = i + 3
+
+
+def _section_span(content: str, header: str) -> tuple[int, int] | None:
+    """
+    (start, end) offsets of the header line through the line before the next ## heading.
+    Returns None if header is missing.
+    """
+    start = _header_line_start(content, header)
+    if start < 0:
+        return None
+    body_start = content.find("\n", start)
+    if body_start < 0:
+        return start, len(content)
+    return start, _next_h2_start(content, body_start + 1)
+
+
+def splice_section(content: str, start: int, end: int, section: str) -> str:
+    """
+    Put section in place of content[start:end] (a span from parse_tasks_and_span
+    or _section_span), separated from what follows by a newline.
+    """
+    rest = content[end:]
+    return content[:start] + section + ("\n" + rest if rest else "")
+
+
+def _append_section(content: str, section: str) -> str:
+    """Append section after a blank line, as the former line-based rewriters did."""
+    if not content:
+        return section
+    content = content.removesuffix("\n")
+    last_line = content[content.rfind("\n") + 1:]
+    return content + ("\n" if not last_line.strip() else "\n\n") + section
 
 
 def replace_tasks_section(content: str, new_tasks_section: str) -> str:
@@ -154,81 +258,63 @@ def replace_tasks_section(content: str, new_tasks_section: str) -> str:
     Replace ## 任务 (and ## 已废弃 if present) in content with new_tasks_section.
     If ## 任务 is missing, append it after the first heading or at start.
     """
-    out: list[str] = []
-    replaced = False
-    i = 0
-    lines = content.splitlines()
-
-    while i < len(lines):
-        line = lines[i]
-        stripped = line.strip()
-        if stripped == TASK_SECTION_HEADER:
-            out.append(new_tasks_section)
-            replaced = True
-            i += 1
-            while i < len(lines) and not lines[i].strip().startswith("## "):
-                i += 1
-            continue
-        if stripped == ABANDONED_SECTION_HEADER:
-            i += 1
-            while i < len(lines) and not lines[i].strip().startswith("## "):
-                i += 1
-            continue
-        out.append(line)
-        i += 1
-
-    if not replaced:
-        if out and out[-1].strip() != "":
-            out.append("")
-        out.append(new_tasks_section)
-    return "\n".join(out)
+    while (span := _section_span(content, ABANDONED_SECTION_HEADER)) is not None:
+        content = content[:span[0]] + content[span[1]:]
+    span = _section_span(content, TASK_SECTION_HEADER)
+    if span is None:
+        return _append_section(content, new_tasks_section)
+    return splice_section(content, span[0], span[1], new_tasks_section)
 
 
 def get_task_section_only(content: str) -> str:
     """Extract only ## 任务 and ## 已废弃 (and their items) for LLM input."""
-    lines = content.splitlines()
-    result: list[str] = []
-    in_section = False
-    for line in lines:
-        s = line.strip()
-        if s == TASK_SECTION_HEADER or s == ABANDONED_SECTION_HEADER:
-            in_section = True
-            result.append(line)
-            continue
-        if in_section:
-            if s.startswith("## "):
-                in_section = False
-            else:
-                result.append(line)
-    return "\n".join(result) if result else ""
+    spans = [
+        span
+        for span in (
+            _section_span(content, TASK_SECTION_HEADER),
+            _section_span(content, ABANDONED_SECTION_HEADER),
+        )
+        if span is not None
+    ]
+    spans.sort()
+    return "".join(content[s:e] for s, e in spans).removesuffix("\n")
+
+
+def parse_tasks_and_span(content: str) -> tuple[list[Task], tuple[int, int] | None]:
+    """
+    Parse tasks and locate the ## 任务 block (plus a directly following ## 已废弃) in one go.
+    Returns (tasks, (start, end)); span is None when the block is missing or the
+    sections are scattered, in which case callers fall back to replace_tasks_section.
+    """
+    task = _section_span(content, TASK_SECTION_HEADER)
+    if task is None:
+        return parse_tasks_from_markdown(content), None
+    start, end = task
+    abandoned = _section_span(content, ABANDONED_SECTION_HEADER)
+    if abandoned is not None:
+        if abandoned[0] != end:
+            return parse_tasks_from_markdown(content), None
+        end = abandoned[1]
+    if (_header_line_start(content, TASK_SECTION_HEADER, end) >= 0
+            or _header_line_start(content, ABANDONED_SECTION_HEADER, end) >= 0):
+        return parse_tasks_from_markdown(content), None
+    return parse_tasks_from_markdown(content[start:end]), (start, end)
+
+
+def strip_summary_section(content: str) -> str:
+    """Return content without the ## 日总结 section (used as LLM input when regenerating it)."""
+    span = _section_span(content, SUMMARY_SECTION_HEADER)
+    if span is None:
+        return content
+    return content[:span[0]] + content[span[1]:]
 
 
 def replace_summary_section(content: str, summary_text: str) -> str:
     """
     Replace ## 日总结 section with new content, or append it after ## 任务 / at end if missing.
     """
-    lines = content.splitlines()
-    out: list[str] = []
-    i = 0
-    replaced = False
-    while i < len(lines):
-        line = lines[i]
-        stripped = line.strip()
-        if stripped == SUMMARY_SECTION_HEADER:
-            out.append(SUMMARY_SECTION_HEADER)
-            out.append("")
-            out.append(summary_text.strip())
-            replaced = True
-            i += 1
-            while i < len(lines) and not lines[i].strip().startswith("## "):
-                i += 1
-            continue
-        out.append(line)
-        i += 1
-    if not replaced:
-        if out and out[-1].strip() != "":
-            out.append("")
-        out.append(SUMMARY_SECTION_HEADER)
-        out.append("")
-        out.append(summary_text.strip())
-    return "\n".join(out)
+    section = f"{SUMMARY_SECTION_HEADER}\n\n{summary_text.strip()}"
+    span = _section_span(content, SUMMARY_SECTION_HEADER)
+    if span is None:
+        return _append_section(content, section)
+    return splice_section(content, span[0], span[1], section)